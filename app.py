@@ -1,8 +1,13 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
-import pytz
+import numpy as np
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
 import os
+import glob
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from octopus_api import OctopusEnergyAPI
 from utils import (
     calculate_costs,
@@ -20,6 +25,8 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+logger = logging.getLogger(__name__)
+
 st.markdown(
     """
     <style>
@@ -32,6 +39,21 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+# UK timezone used for all date handling in the app
+UK_TZ = ZoneInfo('Europe/London')
+
+# Directory holding Parquet copies of API responses so they survive app restarts
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'octopus_agile')
+
+# Seconds after which a cached file is deleted whatever its expiry, keeping the cache bounded
+CACHE_MAX_AGE = 7 * 24 * 3600
+
+# UK time each afternoon when the next day's Agile rates are published
+AGILE_PUBLISH_TIME = time(16, 0)
+
+# HH:MM labels for the 48 half-hour slots, indexed by slot number - 1
+_HHMM = np.array([f"{hour:02d}:{minute:02d}" for hour in range(24) for minute in (0, 30)])
+
 # Get API key from environment variable
 api_key = os.environ.get('OCTOPUS_API_KEY', '')
 MPAN_key = os.environ.get('MPAN_KEY', '')
@@ -52,6 +74,324 @@ if 'default_days' not in st.session_state:
     st.session_state.default_days = 30
 
 
+class EmptyFetchError(Exception):
+    """Raised when an API fetch returns no data, so st.cache_data doesn't keep the failure."""
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _uk_today():
+    """Return today's date in the UK, refreshed each minute."""
+    return datetime.now(UK_TZ).date()
+
+
+@st.cache_resource(show_spinner=False)
+def _api_client(api_key):
+    """Return a shared API client so its HTTP connection pool survives reruns."""
+    return OctopusEnergyAPI(api_key=api_key)
+
+
+def _disk_cached(name, valid_after, fetch, *key, complete=None):
+    """
+    Return a DataFrame from the on-disk Parquet cache, fetching and storing it on a miss.
+    
+    Args:
+        name: Prefix for the cache file name
+        valid_after: POSIX timestamp; files written before it are stale (0 never expires)
+        fetch: Callable returning the DataFrame when the cache misses
+        *key: Values identifying the request (hashed, so secrets stay out of file names)
+        complete: Optional callable taking a DataFrame and returning False when it
+            doesn't yet cover the request; such frames are neither served nor stored
+        
+    Returns:
+        DataFrame read from the cache or returned by fetch
+    """
+    digest = hashlib.sha256(repr(key).encode()).hexdigest()[:16]
+    path = os.path.join(CACHE_DIR, f"{name}_{digest}.parquet")
+    
+    # Use the cached copy while it is fresh
+    try:
+        if os.path.exists(path) and os.path.getmtime(path) >= valid_after:
+            df = pd.read_parquet(path)
+            if complete is None or complete(df):
+                return df
+    except Exception as e:
+        logger.warning("Error reading cache file %s: %s", path, e)
+    
+    df = fetch()
+    
+    # Store successful, complete responses only, so the rest are retried on the next call
+    if not df.empty and (complete is None or complete(df)):
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            df.to_parquet(path, compression='zstd')
+        except Exception as e:
+            logger.warning("Error writing cache file %s: %s", path, e)
+        
+        # Periods move on daily, so drop old files to keep the cache bounded
+        _prune_disk_cache()
+    
+    return df
+
+
+def _prune_disk_cache():
+    """Delete cached files written more than CACHE_MAX_AGE ago."""
+    cutoff = datetime.now().timestamp() - CACHE_MAX_AGE
+    for path in glob.glob(os.path.join(CACHE_DIR, '*.parquet')):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            # Another session pruned it first
+            pass
+        except OSError as e:
+            logger.warning("Error pruning cache file %s: %s", path, e)
+
+
+def _clear_disk_cache():
+    """Delete all cached API responses from disk."""
+    for path in glob.glob(os.path.join(CACHE_DIR, '*.parquet')):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Another session removed it first
+            pass
+        except OSError as e:
+            logger.warning("Error removing cache file %s: %s", path, e)
+
+
+def _tariff_valid_after(period_to):
+    """
+    Return the earliest write time at which a cached tariff response is still current.
+    
+    Args:
+        period_to: End of the requested window, naive values being UK time (None means open-ended)
+        
+    Returns:
+        POSIX timestamp for _disk_cached; 0 when the window has already ended
+    """
+    now = datetime.now(UK_TZ)
+    
+    # Rates for a window that has ended never change, so keep them indefinitely
+    if period_to is not None:
+        window_end = period_to if period_to.tzinfo else period_to.replace(tzinfo=UK_TZ)
+        if window_end <= now:
+            return 0
+    
+    # Otherwise refetch once the latest afternoon publication has happened
+    published = datetime.combine(now.date(), AGILE_PUBLISH_TIME, tzinfo=UK_TZ)
+    if now < published:
+        published -= timedelta(days=1)
+    return published.timestamp()
+
+
+def _tariff_last_slot(period_to):
+    """
+    Return the start of the last half-hour slot a tariff response should already include.
+    
+    Args:
+        period_to: End of the requested window, naive values being UK time (None means open-ended)
+        
+    Returns:
+        Timezone-aware datetime of the expected last valid_from
+    """
+    now = datetime.now(UK_TZ)
+    
+    # Once the afternoon publication time has passed, tomorrow's rates are due too
+    last_day = now.date()
+    if now.time() >= AGILE_PUBLISH_TIME:
+        last_day += timedelta(days=1)
+    last_slot = datetime.combine(last_day, time(23, 30), tzinfo=UK_TZ)
+    
+    # A bounded window only needs rates up to its own final slot
+    if period_to is not None:
+        window_end = period_to if period_to.tzinfo else period_to.replace(tzinfo=UK_TZ)
+        last_slot = min(last_slot, window_end - timedelta(minutes=30))
+    return last_slot
+
+
+@st.cache_data(ttl=1800, show_spinner=False)
+def _fetch_tariff(api_key, period_from=None, period_to=None):
+    """Fetch Agile tariff rates, cached in memory for 30 minutes and on disk until new rates publish."""
+    api = _api_client(api_key)
+    
+    # Rates fetched before Octopus publishes are partial, so keep refetching until they arrive
+    last_slot = _tariff_last_slot(period_to)
+    df = _disk_cached(
+        'tariff',
+        _tariff_valid_after(period_to),
+        lambda: api.get_agile_tariff_rates(period_from=period_from, period_to=period_to),
+        api_key, period_from, period_to,
+        complete=lambda df: df['valid_from'].max() >= last_slot
+    )
+    
+    # Raise on failure, as exceptions aren't cached and the next rerun retries
+    if df.empty:
+        raise EmptyFetchError("No tariff rates returned")
+    return df
+
+
+@st.cache_data(ttl=12 * 3600, show_spinner=False)
+def _fetch_consumption(api_key, mpan, serial_number, period_from, period_to):
+    """Fetch meter consumption data, cached for 12 hours as past readings don't change."""
+    api = _api_client(api_key)
+    df = _disk_cached(
+        'consumption',
+        datetime.now().timestamp() - 12 * 3600,
+        lambda: api.get_consumption_data(
+            mpan=mpan,
+            serial_number=serial_number,
+            period_from=period_from,
+            period_to=period_to
+        ),
+        api_key, mpan, serial_number, period_from, period_to
+    )
+    
+    # Raise on failure, as exceptions aren't cached and the next rerun retries
+    if df.empty:
+        raise EmptyFetchError("No consumption data returned")
+    return df
+
+
+def _slot_numbers(rates_df):
+    """Map rates to 1-48 daily slot positions (00:00 is 1, 00:30 is 2, ...) from their time_minutes."""
+    return (rates_df['time_minutes'].to_numpy() // 30 + 1).astype(np.int8)
+
+
+def _fmt_p(rates):
+    """Format rates in pence as '12.34p' labels in one vectorized pass."""
+    return np.char.add(np.char.mod('%.2f', np.asarray(rates, dtype=np.float64)), 'p')
+
+
+def _period_key(df, column='valid_from'):
+    """Return a cheap cache key identifying a sorted frame by its time bounds and size."""
+    return (df[column].iloc[0], df[column].iloc[-1], len(df))
+
+
+def _day_key(day_df):
+    """Return a cache key for a day of rates, fingerprinting the values so corrected rates miss."""
+    values = day_df['value_inc_vat'].to_numpy()
+    return _period_key(day_df) + (hashlib.sha256(values.tobytes()).hexdigest()[:16],)
+
+
+@st.cache_resource(ttl=60, show_spinner=False)
+def _rates_chart(rates_key, _tariff_df):
+    """
+    Build the rates chart and cheapest slots, rebuilt each minute to move the current-time marker.
+    
+    Cached as a shared resource so a hit returns the figure itself rather than
+    unpickling a copy; callers must treat both return values as read-only. The
+    frame is keyed by `rates_key` instead of being hashed on every rerun.
+    """
+    return create_rates_chart(_tariff_df)
+
+
+@st.cache_resource(ttl=3600, max_entries=20, show_spinner=False)
+def _combined_chart(usage_key, _consumption_df, _cost_df):
+    """Build the combined consumption and cost chart, keyed by `usage_key` (shared, read-only)."""
+    return create_combined_usage_cost_chart(_consumption_df, _cost_df)
+
+
+@st.cache_data(ttl=3600, max_entries=20, show_spinner=False)
+def _cheapest_table(cheapest_slots):
+    """Build the cheapest-slots display table, reused until the slots change."""
+    # Build the display columns straight from the slot arrays
+    slots = _slot_numbers(cheapest_slots)
+    return pd.DataFrame({
+        'Slot #': slots,
+        'Period': cheapest_slots['period'].to_numpy(),
+        'Time': _HHMM[slots - 1],
+        'Rate (p/kWh)': _fmt_p(cheapest_slots['value_inc_vat']),
+    })
+
+
+def _style_cheapest(display_cheapest):
+    """Style the cheapest-slots table; built per render as st.dataframe mutates the Styler."""
+    # Use different colors for each period, styling every cell in one vectorized pass
+    period_mask = display_cheapest['Period'].str.contains('30 min').to_numpy()
+    period_styles = pd.DataFrame(
+        np.where(
+            np.broadcast_to(period_mask[:, None], display_cheapest.shape),
+            'background-color: rgba(0, 128, 0, 0.2)',
+            ''
+        ),
+        index=display_cheapest.index,
+        columns=display_cheapest.columns
+    )
+    
+    return (
+        display_cheapest.style
+        .apply(lambda _: period_styles, axis=None)
+        .set_properties(**{'text-align': 'center'})
+        .set_table_styles([
+            {'selector': 'th', 'props': [('text-align', 'center')]},
+            {'selector': 'td', 'props': [('text-align', 'center')]}
+        ])
+    )
+
+
+def _day_rates(tariff_df, valid_from, day):
+    """
+    Slice a single UK day of rates from a tariff frame sorted by valid_from.
+    
+    Args:
+        tariff_df: DataFrame of tariff rates sorted by valid_from
+        valid_from: DatetimeIndex built from tariff_df['valid_from']
+        day: The date to slice
+        
+    Returns:
+        DataFrame view holding the rates starting on that day
+    """
+    start = pd.Timestamp(day, tz=UK_TZ)
+    end = pd.Timestamp(day + timedelta(days=1), tz=UK_TZ)
+    lo, hi = valid_from.searchsorted([start, end])
+    return tariff_df.iloc[lo:hi]
+
+
+@st.cache_data(ttl=3600, max_entries=10, show_spinner=False)
+def _format_day(day_key, _day_df):
+    """
+    Format one day of rates for display.
+    
+    Args:
+        day_key: Key from _day_key() identifying the slice and its rates
+        _day_df: DataFrame slice of the day's rates (not hashed)
+        
+    Returns:
+        DataFrame with Time and Rate (p/kWh) columns
+    """
+    return pd.DataFrame({
+        'Time': _HHMM[_slot_numbers(_day_df) - 1],
+        'Rate (p/kWh)': _fmt_p(_day_df['value_inc_vat']),
+    })
+
+
+@st.cache_data(ttl=3600, max_entries=20, show_spinner=False)
+def _daily_summary(cost_df):
+    """
+    Aggregate half-hourly costs into one rounded row per day.
+    
+    Args:
+        cost_df: DataFrame returned by calculate_costs, in interval order
+        
+    Returns:
+        DataFrame with date, consumption, cost, standing_charge and total_cost columns
+    """
+    # The rows are already in date order, so each day starts where the date changes
+    dates = cost_df['date'].to_numpy().astype('datetime64[D]')
+    starts = np.flatnonzero(np.concatenate(([True], dates[1:] != dates[:-1])))
+    
+    # Sum each day's run of rows for all columns in a single sequential pass
+    sums = np.add.reduceat(
+        cost_df[['consumption', 'cost', 'standing_charge']].to_numpy(dtype=np.float64), starts, axis=0
+    )
+    
+    # Append the daily total and round every column in one vectorized call
+    values = np.round(np.column_stack([sums, sums[:, 1] + sums[:, 2]]), 2)
+    daily_data = pd.DataFrame(values, columns=['consumption', 'cost', 'standing_charge', 'total_cost'])
+    daily_data.insert(0, 'date', dates[starts].astype(object))
+    return daily_data
+
+
 def sidebar_inputs():
     """Sidebar for API credentials and settings."""
     with st.sidebar:
@@ -76,38 +416,19 @@ def sidebar_inputs():
             # Display current meter info
             st.info(f"MPAN: {st.session_state.mpan}")
             st.info(f"Meter Serial: {st.session_state.meter_serial}")
-            
-            # Allow editing standing charge
-            standing_charge = st.number_input(
-                "Standing Charge (£/day)",
-                value=st.session_state.standing_charge,
-                step=0.00,
-                format="%.2f",
-                help="Daily standing charge in pounds"
-            )
-            
-            # Update standing charge in session state
-            st.session_state.standing_charge = standing_charge
-            
-            # Date range selector for usage page
-            st.header("Date Range")
-            default_days = st.slider(
-                "Days of History", 
-                min_value=7, 
-                max_value=90, 
-                value=30,
-                help="Number of days of history to display"
-            )
-            st.session_state.default_days = default_days
         
         # Update active page in session state
         st.session_state.active_page = page
         
-        # Add a refresh button
+        # Add a refresh button which discards cached API responses; the
+        # click already reruns the app so the pages refetch on this run
         if st.button("Refresh Data"):
-            st.rerun()
+            _fetch_tariff.clear()
+            _fetch_consumption.clear()
+            _clear_disk_cache()
 
 
+@st.fragment
 def rates_page():
     """Display the Agile tariff rates page."""
     st.title("Octopus Agile Half-Hour Electricity Rates")
@@ -117,55 +438,31 @@ def rates_page():
         st.warning("Please provide your Octopus Energy API key in the sidebar.")
         return
     
-    # Initialize API client
-    api = OctopusEnergyAPI(api_key=st.session_state.api_key)
+    # Start the rates window at midnight so the cache key is stable for the day
+    today = _uk_today()
+    today_start = datetime.combine(today, time.min)
     
     # Add a loading indicator
     with st.spinner("Fetching latest Agile tariff rates..."):
         # Fetch the tariff rates
-        tariff_df = api.get_agile_tariff_rates()
-    
-    if tariff_df.empty:
-        st.error("Failed to fetch tariff rates. Please check your API key and try again.")
-        return
+        try:
+            tariff_df = _fetch_tariff(st.session_state.api_key, period_from=today_start)
+        except EmptyFetchError:
+            st.error("Failed to fetch tariff rates. Please check your API key and try again.")
+            return
     
     # Create the chart and get cheapest slots
-    fig, cheapest_slots = create_rates_chart(tariff_df)
+    # Fingerprint the rates by their bounds, size and latest price instead of hashing them
+    rates_key = _period_key(tariff_df) + (float(tariff_df['value_inc_vat'].iloc[-1]),)
+    fig, cheapest_slots = _rates_chart(rates_key, tariff_df)
     
     # Display the cheapest slots table first
     if not cheapest_slots.empty:
         st.subheader("10 Cheapest Half-Hour Slots Today")
         
-        # Format the cheapest slots for display
-        display_cheapest = cheapest_slots.copy()
-        display_cheapest['Time'] = display_cheapest['time']
-        display_cheapest['Period'] = display_cheapest['period']
-        display_cheapest['Rate (p/kWh)'] = display_cheapest['value_inc_vat'].map(lambda x: f"{x:.2f}p")
-        # Map half-hour slots to 1-48 daily positions (00:00 is 1, 00:30 is 2, ...)
-        display_cheapest['Slot #'] = (
-            display_cheapest['valid_from'].dt.hour * 2
-            + (display_cheapest['valid_from'].dt.minute // 30)
-            + 1
-        )
-        
-        # Select and order columns for display
-        display_cheapest = display_cheapest[['Slot #', 'Period', 'Time', 'Rate (p/kWh)']].reset_index(drop=True)
-        
-        # Use different colors for each period
-        def highlight_period(row):
-            if '30 min' in row['Period']:
-                return ['background-color: rgba(0, 128, 0, 0.2)'] * len(row)
-            return [''] * len(row)
-        
         # Display the styled table
         st.dataframe(
-            display_cheapest.style
-            .apply(highlight_period, axis=1)
-            .set_properties(**{'text-align': 'center'})
-            .set_table_styles([
-                {'selector': 'th', 'props': [('text-align', 'center')]},
-                {'selector': 'td', 'props': [('text-align', 'center')]}
-            ]),
+            _style_cheapest(_cheapest_table(cheapest_slots)),
             use_container_width=True,
             hide_index=True,
             column_config={
@@ -179,103 +476,76 @@ def rates_page():
             st.markdown("🟢 **30 min (00:01-23:59)**")
     
     # Display the chart
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(fig, use_container_width=True, key="rates_chart")
     
-    # Get timezone
-    uk_tz = pytz.timezone('Europe/London')
-    today = datetime.now(uk_tz).date()
+    # Index the sorted start times for day lookups
+    valid_from = pd.DatetimeIndex(tariff_df['valid_from'])
     
-    # Add expandable section for all of today's rates
-    with st.expander("View All of Today's Rates"):
-        today_rates = tariff_df[tariff_df['date'] == today].copy()
+    # Only build the full rate tables once the user asks for them
+    if st.checkbox("View All of Today's Rates", key="show_today"):
+        today_rates = _day_rates(tariff_df, valid_from, today)
         
         if not today_rates.empty:
-            cheapest_times = set(cheapest_slots['valid_from']) if not cheapest_slots.empty else set()
             cheapest_rank = {}
             if not cheapest_slots.empty:
-                sorted_cheapest = cheapest_slots.sort_values(by='valid_from').reset_index(drop=True)
-                for idx, row in sorted_cheapest.iterrows():
-                    cheapest_rank[row['valid_from']] = f"{idx + 1}/10"
+                # Rank the picks in time order, pairing start times with labels directly
+                sorted_times = cheapest_slots['valid_from'].sort_values()
+                cheapest_rank = dict(zip(
+                    sorted_times,
+                    [f"{rank}/10" for rank in range(1, len(sorted_times) + 1)]
+                ))
 
-            # Format for display
-            today_rates['Time'] = today_rates['valid_from'].dt.strftime('%H:%M')
-            today_rates['Rate (p/kWh)'] = today_rates['value_inc_vat'].map(lambda x: f"{x:.2f}p")
-            today_rates['Pick #'] = today_rates['valid_from'].map(cheapest_rank).fillna('')
-            today_rates['Is Cheapest'] = today_rates['valid_from'].isin(cheapest_times)
-            today_rates['Slot #'] = (
-                today_rates['valid_from'].dt.hour * 2
-                + (today_rates['valid_from'].dt.minute // 30)
-                + 1
-            )
-            
-            # Select and rename columns for display
-            display_df = today_rates[['Slot #', 'Pick #', 'Is Cheapest', 'Time', 'Rate (p/kWh)']].reset_index(drop=True)
-
-            def format_slot(row):
-                if row['Is Cheapest']:
-                    return f"{row['Slot #']} ⭐ {row['Pick #']}"
-                return str(row['Slot #'])
-
-            display_df['Slot #'] = display_df.apply(format_slot, axis=1)
-            display_df = display_df[['Slot #', 'Time', 'Rate (p/kWh)']]
-
-            def highlight_cheapest(row):
-                if '⭐' in row['Slot #']:
-                    return ['background-color: rgba(144, 238, 144, 0.3); font-weight: bold'] * len(row)
-                return [''] * len(row)
-
-            styled_df = (
-                display_df.style
-                .apply(highlight_cheapest, axis=1)
-                .set_properties(subset=['Slot #'], **{'white-space': 'nowrap', 'width': '1%'})
-                .set_properties(**{'text-align': 'center'})
-                .set_table_styles([
-                    {'selector': 'th.col0', 'props': [('white-space', 'nowrap'), ('width', '1%')]},
-                    {'selector': 'th', 'props': [('text-align', 'center')]},
-                    {'selector': 'td', 'props': [('text-align', 'center')]}
-                ])
-            )
+            # Only the cheapest slots have a pick label, so the labels double as the mask
+            pick_labels = today_rates['valid_from'].map(cheapest_rank).fillna('').to_numpy(dtype=str)
+            slot_labels = _slot_numbers(today_rates).astype(str)
 
-            # Display as table
+            # Build exactly the displayed columns, starring the cheapest slots with their pick number
+            day_display = _format_day(_day_key(today_rates), today_rates)
+            display_df = pd.DataFrame({
+                'Slot #': np.where(
+                    pick_labels != '', np.char.add(np.char.add(slot_labels, ' ⭐ '), pick_labels), slot_labels
+                ),
+                'Time': day_display['Time'].to_numpy(),
+                'Rate (p/kWh)': day_display['Rate (p/kWh)'].to_numpy(),
+            })
+
+            # Plain strings render without the Styler; the star marks the cheapest rows
             st.dataframe(
-                styled_df,
+                display_df,
                 use_container_width=True,
                 hide_index=True,
                 column_config={
-                    "Slot #": st.column_config.TextColumn("Slot #", width="small")
+                    "Slot #": st.column_config.TextColumn("Slot #", width="small", alignment="center"),
+                    "Time": st.column_config.TextColumn("Time", alignment="center"),
+                    "Rate (p/kWh)": st.column_config.TextColumn("Rate (p/kWh)", alignment="center"),
                 }
             )
         else:
             st.info("No rates available for today.")
     
-    # Add expandable section for tomorrow's rates
-    tomorrow = (datetime.now(uk_tz) + timedelta(days=1)).date()
+    tomorrow = today + timedelta(days=1)
     
-    with st.expander("View Tomorrow's Rates"):
-        tomorrow_rates = tariff_df[tariff_df['date'] == tomorrow].copy()
+    if st.checkbox("View Tomorrow's Rates", key="show_tomorrow"):
+        tomorrow_rates = _day_rates(tariff_df, valid_from, tomorrow)
         
         if not tomorrow_rates.empty:
             # Format for display
-            tomorrow_rates['Time'] = tomorrow_rates['valid_from'].dt.strftime('%H:%M')
-            tomorrow_rates['Rate (p/kWh)'] = tomorrow_rates['value_inc_vat'].map(lambda x: f"{x:.2f}p")
-            
-            # Select and rename columns for display
-            display_df = tomorrow_rates[['Time', 'Rate (p/kWh)']].reset_index(drop=True)
+            display_df = _format_day(_day_key(tomorrow_rates), tomorrow_rates)
             
             # Display as table
             st.dataframe(
-                display_df.style
-                .set_properties(**{'text-align': 'center'})
-                .set_table_styles([
-                    {'selector': 'th', 'props': [('text-align', 'center')]},
-                    {'selector': 'td', 'props': [('text-align', 'center')]}
-                ]),
-                use_container_width=True
+                display_df,
+                use_container_width=True,
+                column_config={
+                    "Time": st.column_config.TextColumn("Time", alignment="center"),
+                    "Rate (p/kWh)": st.column_config.TextColumn("Rate (p/kWh)", alignment="center"),
+                }
             )
         else:
             st.info("Rates for tomorrow are not yet available.")
 
 
+@st.fragment
 def usage_page():
     """Display the electricity usage and cost page."""
     st.title("Electricity Usage and Cost History")
@@ -289,32 +559,70 @@ def usage_page():
         st.warning("Please provide your electricity meter MPAN and serial number in the sidebar.")
         return
     
-    # Initialize API client
-    api = OctopusEnergyAPI(api_key=st.session_state.api_key)
+    # Usage controls live inside the fragment so changing them only reruns this page
+    col1, col2 = st.columns(2)
     
-    # Use date range from sidebar
-    default_days = st.session_state.default_days
+    with col1:
+        # Allow editing standing charge
+        standing_charge = st.number_input(
+            "Standing Charge (£/day)",
+            value=st.session_state.standing_charge,
+            step=0.00,
+            format="%.2f",
+            help="Daily standing charge in pounds"
+        )
+        
+        # Update standing charge in session state
+        st.session_state.standing_charge = standing_charge
     
-    # Calculate date range based on default_days
-    to_date = datetime.now()
-    from_date = to_date - timedelta(days=default_days)
+    with col2:
+        # Date range selector for usage page
+        default_days = st.slider(
+            "Days of History", 
+            min_value=7, 
+            max_value=90, 
+            value=st.session_state.default_days,
+            help="Number of days of history to display"
+        )
+        
+        # Remember the range so it is restored after switching pages
+        st.session_state.default_days = default_days
     
-    # Display the selected date range
-    st.info(f"Showing data from {from_date.strftime('%d %b %Y')} to {to_date.strftime('%d %b %Y')}")
+    # Quantize the range to whole UK days so the fetch cache key is stable within a day
+    today = _uk_today()
+    period_from = datetime.combine(today - timedelta(days=default_days), time.min)
+    period_to = datetime.combine(today, time.max)
     
-    # Convert dates to datetime objects at start and end of day
-    period_from = datetime.combine(from_date.date(), datetime.min.time())
-    period_to = datetime.combine(to_date.date(), datetime.max.time())
+    # Display the selected date range
+    st.info(f"Showing data from {period_from.strftime('%d %b %Y')} to {period_to.strftime('%d %b %Y')}")
     
     # Add a loading indicator
-    with st.spinner("Fetching your electricity usage data..."):
-        # Fetch consumption data
-        consumption_df = api.get_consumption_data(
-            mpan=st.session_state.mpan,
-            serial_number=st.session_state.meter_serial,
-            period_from=period_from,
-            period_to=period_to
-        )
+    with st.spinner("Fetching your electricity usage data and tariff rates..."):
+        # The two fetches are independent, so run them concurrently; the tariff
+        # rates cover the same period so there is a rate for all usage
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            consumption_future = executor.submit(
+                _fetch_consumption,
+                st.session_state.api_key,
+                st.session_state.mpan,
+                st.session_state.meter_serial,
+                period_from,
+                period_to
+            )
+            tariff_future = executor.submit(
+                _fetch_tariff,
+                st.session_state.api_key,
+                period_from=period_from,
+                period_to=period_to
+            )
+            try:
+                consumption_df = consumption_future.result()
+            except EmptyFetchError:
+                consumption_df = pd.DataFrame()
+            try:
+                tariff_df = tariff_future.result()
+            except EmptyFetchError:
+                tariff_df = pd.DataFrame()
     
     if consumption_df.empty:
         st.error("Failed to fetch consumption data. Please check your meter details and try again.")
@@ -322,21 +630,14 @@ def usage_page():
     
     # Initialize cost_df as empty DataFrame in case tariff fetch fails
     cost_df = pd.DataFrame()
-    
-    # Fetch tariff rates for the whole consumption period
-    with st.spinner("Fetching historical tariff rates for cost calculation..."):
-        # Use the same period as the consumption data to ensure we have rates for all usage
-        tariff_df = api.get_agile_tariff_rates(
-            period_from=period_from,
-            period_to=period_to
-        )
+    totals = {}
     
     if tariff_df.empty:
         st.error("Failed to fetch historical tariff rates. Cost calculations will not be available.")
     else:
         st.success(f"Successfully retrieved {len(tariff_df)} historical tariff rate records for cost calculation.")
         # Calculate costs
-        cost_df = calculate_costs(
+        cost_df, totals = calculate_costs(
             consumption_df, 
             tariff_df, 
             standing_charge=st.session_state.standing_charge
@@ -344,16 +645,18 @@ def usage_page():
     
     # Create combined consumption and cost chart
     st.subheader("Electricity Consumption and Cost")
-    combined_fig = create_combined_usage_cost_chart(consumption_df, cost_df)
-    st.plotly_chart(combined_fig, use_container_width=True)
+    # The totals change with the rates and standing charge, so they complete the fingerprint
+    usage_key = _period_key(consumption_df, 'interval_start') + tuple(totals.values())
+    combined_fig = _combined_chart(usage_key, consumption_df, cost_df)
+    st.plotly_chart(combined_fig, use_container_width=True, key="combined_chart")
     
     # Display summary statistics
     if not cost_df.empty:
         st.subheader("Monthly Usage Summary")
         
-        total_consumption = consumption_df['consumption'].sum()
-        total_cost = cost_df['cost'].sum()
-        total_standing_charge = cost_df['standing_charge'].sum()
+        total_consumption = totals['consumption']
+        total_cost = totals['cost']
+        total_standing_charge = totals['standing_charge']
         total_bill = total_cost + total_standing_charge
         
         col1, col2, col3, col4 = st.columns(4)
@@ -370,37 +673,21 @@ def usage_page():
         with col4:
             st.metric("Total Bill", f"£{total_bill:.2f}")
         
-        # Display detailed data in an expandable section
-        with st.expander("View Detailed Daily Data"):
-            # Group by day
-            daily_data = cost_df.groupby('date').agg({
-                'consumption': 'sum',
-                'cost': 'sum',
-                'standing_charge': 'sum'
-            }).reset_index()
-            
-            # Calculate total cost
-            daily_data['total_cost'] = daily_data['cost'] + daily_data['standing_charge']
+        # Only build the detailed table once the user asks for it
+        if st.checkbox("View Detailed Daily Data", key="show_daily"):
+            daily_data = _daily_summary(cost_df)
             
             # Format for display
-            display_df = daily_data.copy()
-            display_df['Date'] = display_df['date']
-            display_df['Consumption (kWh)'] = display_df['consumption'].round(2)
-            display_df['Usage Cost (£)'] = display_df['cost'].round(2)
-            display_df['Standing Charge (£)'] = display_df['standing_charge'].round(2)
-            display_df['Total Cost (£)'] = display_df['total_cost'].round(2)
-            
-            # Select columns for display
-            display_df = display_df[[
-                'Date', 
-                'Consumption (kWh)', 
-                'Usage Cost (£)', 
-                'Standing Charge (£)', 
-                'Total Cost (£)'
-            ]]
+            display_df = daily_data.rename(columns={
+                'date': 'Date',
+                'consumption': 'Consumption (kWh)',
+                'cost': 'Usage Cost (£)',
+                'standing_charge': 'Standing Charge (£)',
+                'total_cost': 'Total Cost (£)'
+            })
             
-            # Sort by date (most recent first)
-            display_df = display_df.sort_values(by='Date', ascending=False)
+            # Most recent first; the summary is already in ascending date order
+            display_df = display_df.iloc[::-1].reset_index(drop=True)
             
             # Display as table
             st.dataframe(display_df, use_container_width=True)
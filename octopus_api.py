@@ -1,17 +1,170 @@
+import itertools
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 from datetime import datetime, timedelta
-import pytz
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
 
 class OctopusEnergyAPI:
     """Class to interact with the Octopus Energy API."""
     
     BASE_URL = "https://api.octopus.energy/v1"
+    MAX_CONCURRENT_PAGES = 8
+    # UK timezone shared by every method for local-time conversions
+    UK_TZ = ZoneInfo("Europe/London")
+    # Connect and read timeouts in seconds for every request
+    REQUEST_TIMEOUT = (5, 30)
+    # Timestamps come back as ISO 8601 with a 'Z' or '+01:00' style offset
+    TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
     
     def __init__(self, api_key=None):
         """Initialize the API wrapper with an API key."""
         self.api_key = api_key
         self.auth = (api_key, "") if api_key else None
+        
+        # Reuse one session so connections are kept alive between requests;
+        # the app runs two paginated fetches at once on a shared client, so the
+        # pool holds a full batch of page requests for each, and transient
+        # server errors or rate limiting are retried with backoff
+        self.session = requests.Session()
+        self.session.auth = self.auth
+        self.session.headers["Accept-Encoding"] = "gzip"
+        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=2 * self.MAX_CONCURRENT_PAGES,
+            max_retries=retries
+        ))
+    
+    def _get_page(self, url, params=None):
+        """Fetch a single page from the API and return its parsed JSON."""
+        response = self.session.get(url, params=params, timeout=self.REQUEST_TIMEOUT)
+        response.raise_for_status()
+        # orjson parses the large result pages much faster than the stdlib decoder
+        return orjson.loads(response.content)
+    
+    @staticmethod
+    def _records_to_frame(records, fields):
+        """
+        Build a DataFrame column by column from API result records.
+        
+        Args:
+            records: List of result dicts from the API
+            fields: Names of the fields to keep, in column order
+            
+        Returns:
+            DataFrame with one column per field
+        """
+        return pd.DataFrame({field: [record.get(field) for record in records] for field in fields})
+    
+    @staticmethod
+    def _minute_of_day(timestamps):
+        """Return minutes since local midnight for a tz-aware Series, as int16."""
+        wall_minutes = timestamps.dt.tz_localize(None).to_numpy().astype("datetime64[m]").astype("int64")
+        return (wall_minutes % 1440).astype("int16")
+    
+    def _get_all_results(self, url, params):
+        """
+        Fetch the results from every page of a paginated endpoint.
+        
+        The first page is fetched on its own to learn the total count, then
+        the remaining pages are requested concurrently.
+        
+        Args:
+            url: The endpoint URL
+            params: Query parameters for the request
+            
+        Returns:
+            List of result records from all pages, in page order
+        """
+        data = self._get_page(url, params)
+        results = data.get("results", [])
+        
+        if not data.get("next") or not results:
+            return results
+        
+        # Collect each page's records and flatten them once at the end
+        pages = [results]
+        
+        count = data.get("count")
+        if count is None:
+            # Without a count the page total is unknown, so follow the links in turn
+            next_url = data.get("next")
+            while next_url:
+                logger.debug("Fetching next page...")
+                data = self._get_page(next_url)
+                pages.append(data.get("results", []))
+                next_url = data.get("next")
+            return list(itertools.chain.from_iterable(pages))
+        
+        # Derive the page total from the page size the API actually served
+        page_count = math.ceil(count / len(results))
+        logger.debug("Fetching %d more pages concurrently...", page_count - 1)
+        
+        def fetch_page(page):
+            return self._get_page(url, {**params, "page": page}).get("results", [])
+        
+        with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_PAGES) as executor:
+            pages.extend(executor.map(fetch_page, range(2, page_count + 1)))
+        
+        return list(itertools.chain.from_iterable(pages))
+    
+    def _fetch_paginated(self, url, params, fields, start_column, end_column):
+        """
+        Fetch every page of a half-hourly endpoint into a DataFrame in UK time.
+        
+        Args:
+            url: The endpoint URL
+            params: Query parameters for the request
+            fields: Names of the record fields to keep, including start_column
+            start_column: Field holding the ISO 8601 start of each half hour
+            end_column: Name of the derived column holding the end of each half hour
+            
+        Returns:
+            DataFrame sorted by start_column with date and time_minutes columns
+            added, or an empty DataFrame when there are no results
+        """
+        # Make the API requests, fetching any further pages concurrently
+        records = self._get_all_results(url, params)
+        
+        if not records:
+            return pd.DataFrame()
+        
+        # Convert to pandas DataFrame one column at a time
+        df = self._records_to_frame(records, fields)
+        
+        # Parse the ISO 8601 timestamps with an explicit format and convert
+        # to UK local time (handles BST/GMT automatically)
+        df[start_column] = pd.to_datetime(df[start_column], format=self.TIMESTAMP_FORMAT, utc=True).dt.tz_convert(self.UK_TZ)
+        
+        # Slots are always half-hourly, so derive the end of each one instead of parsing it
+        df[end_column] = df[start_column] + pd.Timedelta(minutes=30)
+        
+        # Add a day column for filtering based on UK time, stored as midnight
+        # datetime64 values so day comparisons stay vectorized
+        df["date"] = df[start_column].dt.tz_localize(None).dt.normalize()
+        
+        # Add the time of day as minutes since midnight; labels are made at display time
+        df["time_minutes"] = self._minute_of_day(df[start_column])
+        
+        # Sort by start time; the API returns newest first, so usually
+        # reversing the rows is enough and a full sort is only a fallback
+        if df[start_column].is_monotonic_decreasing:
+            df = df.iloc[::-1].reset_index(drop=True)
+        elif not df[start_column].is_monotonic_increasing:
+            df = df.sort_values(start_column, kind="stable", ignore_index=True)
+        
+        # Record the ordering so consumers can skip sorting again
+        df.attrs["sorted_on"] = start_column
+        return df
     
     def get_agile_tariff_rates(self, tariff_code="E-1R-AGILE-24-10-01-C", product_code="AGILE-24-10-01", 
                              period_from=None, period_to=None):
@@ -29,8 +182,7 @@ class OctopusEnergyAPI:
         """
         try:
             # Calculate the date range if not provided
-            uk_tz = pytz.timezone('Europe/London')
-            now = datetime.now(uk_tz)
+            now = datetime.now(self.UK_TZ)
             
             if period_from is None:
                 # Default to today at 00:00
@@ -49,7 +201,7 @@ class OctopusEnergyAPI:
             period_from_str = period_from.strftime("%Y-%m-%dT%H:%M:%SZ")
             period_to_str = period_to.strftime("%Y-%m-%dT%H:%M:%SZ")
             
-            print(f"Fetching tariff rates from {period_from_str} to {period_to_str}")
+            logger.debug("Fetching tariff rates from %s to %s", period_from_str, period_to_str)
             
             # Construct the API URL
             url = f"{self.BASE_URL}/products/{product_code}/electricity-tariffs/{tariff_code}/standard-unit-rates/"
@@ -61,61 +213,32 @@ class OctopusEnergyAPI:
                 "page_size": 1500,  # Request more rates at once
             }
             
-            # Make the API request
-            response = requests.get(url, params=params, auth=self.auth)
-            response.raise_for_status()
+            # Fetch the rates from every page
+            df = self._fetch_paginated(
+                url,
+                params,
+                ("value_exc_vat", "value_inc_vat", "valid_from", "payment_method"),
+                "valid_from",
+                "valid_to"
+            )
             
-            # Parse the response
-            data = response.json()
-            rates = data.get("results", [])
+            if df.empty:
+                logger.info("No tariff rates found for the specified period.")
+                return df
             
-            # Check if we need to get more pages
-            next_url = data.get("next")
-            while next_url:
-                print(f"Fetching next page of tariff rates...")
-                response = requests.get(next_url, auth=self.auth)
-                response.raise_for_status()
-                data = response.json()
-                rates.extend(data.get("results", []))
-                next_url = data.get("next")
-            
-            if not rates:
-                print("No tariff rates found for the specified period.")
-                return pd.DataFrame()
-            
-            # Convert to pandas DataFrame
-            df = pd.DataFrame(rates)
-            
-            print(f"Retrieved {len(df)} tariff rate records")
-            
-            # Convert timestamps to datetime objects with UTC timezone
-            df["valid_from"] = pd.to_datetime(df["valid_from"], utc=True)
-            df["valid_to"] = pd.to_datetime(df["valid_to"], utc=True)
-            
-            # Convert to UK local time (handles BST/GMT automatically)
-            uk_tz = pytz.timezone('Europe/London')
-            df["valid_from"] = df["valid_from"].dt.tz_convert(uk_tz)
-            df["valid_to"] = df["valid_to"].dt.tz_convert(uk_tz)
-            
-            # Add a day column for filtering based on UK time
-            df["date"] = df["valid_from"].dt.date
+            logger.debug("Retrieved %d tariff rate records", len(df))
             
-            # Add a time column for display
-            df["time"] = df["valid_from"].dt.strftime("%H:%M")
-            
-            # Convert value_inc_vat to numeric
+            # Convert value_inc_vat to numeric, keeping float64 as some rates
+            # carry more than two decimal places and must round as published
             df["value_inc_vat"] = pd.to_numeric(df["value_inc_vat"])
             
-            # Sort by valid_from
-            df = df.sort_values("valid_from")
-            
             return df
             
         except requests.exceptions.RequestException as e:
-            print(f"API Request Error: {e}")
+            logger.error("API Request Error: %s", e)
             return pd.DataFrame()
         except Exception as e:
-            print(f"Error fetching tariff rates: {e}")
+            logger.error("Error fetching tariff rates: %s", e)
             return pd.DataFrame()
 
     def get_consumption_data(self, mpan, serial_number, period_from=None, period_to=None):
@@ -134,8 +257,7 @@ class OctopusEnergyAPI:
         try:
             # Set default period (last 30 days) if not provided
             if not period_from or not period_to:
-                uk_tz = pytz.timezone('Europe/London')
-                now = datetime.now(uk_tz)
+                now = datetime.now(self.UK_TZ)
                 
                 if not period_to:
                     period_to = now
@@ -155,45 +277,29 @@ class OctopusEnergyAPI:
                 "period_from": period_from_str,
                 "period_to": period_to_str,
                 "page_size": 5000,  # Request a large page size to get all data
+                "order_by": "period",  # Oldest first, so the rows need no reordering
             }
             
-            # Make the API request
-            response = requests.get(url, params=params, auth=self.auth)
-            response.raise_for_status()
-            
-            # Parse the response
-            data = response.json()
-            consumption = data.get("results", [])
-            
-            if not consumption:
-                return pd.DataFrame()
+            # Fetch the readings from every page
+            df = self._fetch_paginated(
+                url,
+                params,
+                ("consumption", "interval_start"),
+                "interval_start",
+                "interval_end"
+            )
             
-            # Convert to pandas DataFrame
-            df = pd.DataFrame(consumption)
+            if df.empty:
+                return df
             
-            # Convert timestamps to datetime objects with UTC timezone
-            df["interval_start"] = pd.to_datetime(df["interval_start"], utc=True)
-            df["interval_end"] = pd.to_datetime(df["interval_end"], utc=True)
-            
-            # Convert to UK local time (handles BST/GMT automatically)
-            uk_tz = pytz.timezone('Europe/London')
-            df["interval_start"] = df["interval_start"].dt.tz_convert(uk_tz)
-            df["interval_end"] = df["interval_end"].dt.tz_convert(uk_tz)
-            
-            # Add date and time columns based on UK time
-            df["date"] = df["interval_start"].dt.date
-            df["time"] = df["interval_start"].dt.strftime("%H:%M")
             # Also add hour column for time period analysis
-            df["hour"] = df["interval_start"].dt.hour
-            
-            # Sort by interval_start
-            df = df.sort_values("interval_start")
+            df["hour"] = df["time_minutes"] // 60
             
             return df
             
         except requests.exceptions.RequestException as e:
-            print(f"API Request Error: {e}")
+            logger.error("API Request Error: %s", e)
             return pd.DataFrame()
         except Exception as e:
-            print(f"Error fetching consumption data: {e}")
+            logger.error("Error fetching consumption data: %s", e)
             return pd.DataFrame()
@@ -1,8 +1,15 @@
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
-import pytz
+from zoneinfo import ZoneInfo
 import plotly.graph_objects as go
 import plotly.express as px
+import logging
+
+logger = logging.getLogger(__name__)
+
+# UK timezone used when deciding which rates fall on today and tomorrow
+UK_TZ = ZoneInfo('Europe/London')
 
 def calculate_costs(consumption_df, tariff_df, standing_charge=0.5):
     """
@@ -14,60 +21,60 @@ def calculate_costs(consumption_df, tariff_df, standing_charge=0.5):
         standing_charge: Standing charge in pounds per day
         
     Returns:
-        DataFrame with consumption data and calculated costs
+        Tuple of (DataFrame with consumption data and calculated costs,
+        dict of 'consumption', 'cost' and 'standing_charge' totals)
     """
     if consumption_df.empty or tariff_df.empty:
-        return pd.DataFrame()
+        return pd.DataFrame(), {}
     
     # Create a copy of the consumption DataFrame
     result_df = consumption_df.copy()
     
-    # Merge rates into consumption data based on time periods
-    result_df['cost'] = 0.0
-    
-    # For each consumption interval, find the matching tariff rate
-    for idx, row in result_df.iterrows():
-        interval_start = row['interval_start']
-        
-        # Find the corresponding tariff rate
-        matching_rate = tariff_df[
-            (tariff_df['valid_from'] <= interval_start) & 
-            (tariff_df['valid_to'] > interval_start)
-        ]
-        
-        if not matching_rate.empty:
-            # Calculate cost: consumption (kWh) * rate (pence/kWh) / 100 (to convert to pounds)
-            rate = matching_rate['value_inc_vat'].values[0]
-            consumption = row['consumption']
-            cost = (consumption * rate) / 100  # Convert pence to pounds
-            result_df.at[idx, 'cost'] = cost
-    
-    # Add the standing charge
-    # Group by date to add standing charge once per day
-    daily_df = result_df.groupby('date').first().reset_index()
-    
-    # Create a mapping of dates to include the standing charge
-    standing_charge_map = {date: standing_charge for date in daily_df['date']}
-    
-    # Add a column for the standing charge based on the date
-    result_df['standing_charge'] = result_df['date'].map(standing_charge_map)
-    
-    # For dates where we've already added the standing charge, set to 0 for other entries
-    result_df['standing_charge'] = result_df.groupby('date')['standing_charge'].transform(
-        lambda x: pd.Series([x.iloc[0]] + [0] * (len(x) - 1), index=x.index)
-    )
+    # Sort the rates so every interval's rate can be found by binary search,
+    # unless the API client has already recorded that they are in order
+    rates = tariff_df
+    if tariff_df.attrs.get('sorted_on') != 'valid_from':
+        rates = tariff_df.sort_values('valid_from')
+    valid_from = pd.DatetimeIndex(rates['valid_from'])
+    valid_to = pd.DatetimeIndex(rates['valid_to'])
+    rate_values = rates['value_inc_vat'].to_numpy()
+    
+    # For each consumption interval the candidate is the last rate starting at or before it
+    interval_start = pd.DatetimeIndex(result_df['interval_start'])
+    pos = valid_from.searchsorted(interval_start, side='right') - 1
+    
+    # The rate only applies if it is still valid when the interval starts
+    matched = pos >= 0
+    matched[matched] = valid_to[pos[matched]] > interval_start[matched]
+    
+    # Calculate cost: consumption (kWh) * rate (pence/kWh) / 100 (to convert to pounds)
+    consumption = result_df['consumption'].to_numpy(dtype=np.float64)
+    cost = np.zeros(len(result_df))
+    cost[matched] = consumption[matched] * rate_values[pos[matched]] / 100
+    result_df['cost'] = cost
+    
+    # Add the standing charge once per day, on the first interval of each date
+    first_of_day = ~result_df['date'].duplicated(keep='first').to_numpy()
+    result_df['standing_charge'] = np.where(first_of_day, standing_charge, 0.0)
     
     # Calculate the total cost including standing charge
-    result_df['total_cost'] = result_df['cost'] + result_df['standing_charge']
+    result_df['total_cost'] = cost + result_df['standing_charge'].to_numpy()
+    
+    # The standing charge is added once for each day present
+    totals = {
+        'consumption': float(consumption.sum()),
+        'cost': float(cost.sum()),
+        'standing_charge': standing_charge * int(first_of_day.sum()),
+    }
     
-    return result_df
+    return result_df, totals
 
 def create_rates_chart(tariff_df):
     """
     Create a chart to display tariff rates with highlighted cheapest slots.
     
     Args:
-        tariff_df: DataFrame containing tariff rates
+        tariff_df: DataFrame containing tariff rates, as returned by get_agile_tariff_rates
         
     Returns:
         Tuple of (Plotly figure, DataFrame of cheapest slots)
@@ -76,14 +83,24 @@ def create_rates_chart(tariff_df):
         return go.Figure(), pd.DataFrame()
 
     # Get today's and tomorrow's dates in UK timezone
-    uk_tz = pytz.timezone('Europe/London')
-    now = datetime.now(uk_tz)
+    now = datetime.now(UK_TZ)
     today = now.date()
-    tomorrow = (now + timedelta(days=1)).date()
-    
-    # Filter for today and tomorrow
-    today_rates = tariff_df[tariff_df['date'] == today].copy()
-    tomorrow_rates = tariff_df[tariff_df['date'] == tomorrow].copy()
+    tomorrow = today + timedelta(days=1)
+    
+    # Sort the rates for the binary search below, unless the API client has
+    # already recorded that they are in order
+    if tariff_df.attrs.get('sorted_on') != 'valid_from':
+        tariff_df = tariff_df.sort_values('valid_from')
+    
+    # Slice today and tomorrow from the sorted rates by binary searching
+    # the day boundaries; both slices are only read
+    day_bounds = [
+        pd.Timestamp(day).tz_localize(UK_TZ)
+        for day in (today, tomorrow, tomorrow + timedelta(days=1))
+    ]
+    today_start, tomorrow_start, tomorrow_end = pd.DatetimeIndex(tariff_df['valid_from']).searchsorted(day_bounds)
+    today_rates = tariff_df.iloc[today_start:tomorrow_start]
+    tomorrow_rates = tariff_df.iloc[tomorrow_start:tomorrow_end]
     
     # Initialize cheapest_slots DataFrame
     cheapest_slots = pd.DataFrame()
@@ -94,28 +111,35 @@ def create_rates_chart(tariff_df):
         min_minutes = 1
         max_minutes = 23 * 60 + 59
 
-        # Print the timezone information for debugging
-        print(f"Using timezone: {today_rates['valid_from'].iloc[0].tzinfo}")
+        # Log the timezone information for debugging
+        logger.debug("Using timezone: %s", today_rates['valid_from'].iloc[0].tzinfo)
 
         # Build a single mask and get the 10 cheapest slots overall for today
-        today_rates['minute_of_day'] = (
-            today_rates['valid_from'].dt.hour * 60 + today_rates['valid_from'].dt.minute
-        )
-        valid_mask = (today_rates['minute_of_day'] >= min_minutes) & (
-            today_rates['minute_of_day'] <= max_minutes
-        )
+        # from the minutes since local midnight the API client recorded
+        minute_of_day = today_rates['time_minutes'].to_numpy()
+        valid_mask = (minute_of_day >= min_minutes) & (minute_of_day <= max_minutes)
 
-        cheapest_slots = today_rates[valid_mask].nsmallest(10, 'value_inc_vat').copy()
+        candidates = today_rates[valid_mask]
+        rates = candidates['value_inc_vat'].to_numpy()
+        count = min(10, len(rates))
+        
+        # Partition to find the 10th cheapest rate in linear time, then keep every
+        # slot below it and the earliest slots equal to it, as nsmallest would
+        picks = np.arange(0)
+        if count:
+            threshold = np.partition(rates, count - 1)[count - 1]
+            below = np.flatnonzero(rates < threshold)
+            picks = np.concatenate([below, np.flatnonzero(rates == threshold)[:count - len(below)]])
+            picks = picks[np.argsort(rates[picks], kind='stable')]
+        
+        cheapest_slots = candidates.iloc[picks].copy()
         cheapest_slots['period'] = '30 min'
     
-    # Create marker colors based on time periods
-    marker_colors = []
+    # Mark today's cheapest slots with one hashed membership test
     if not today_rates.empty:
-        for _, row in today_rates.iterrows():
-            if row['valid_from'] in cheapest_slots['valid_from'].values:
-                marker_colors.append('green')
-            else:
-                marker_colors.append('blue')
+        is_cheap = today_rates['valid_from'].isin(cheapest_slots['valid_from']).to_numpy()
+        marker_colors = np.where(is_cheap, 'green', 'blue')
+        marker_symbols = np.where(is_cheap, 'star', 'circle')
     
     fig = go.Figure()
     
@@ -130,10 +154,7 @@ def create_rates_chart(tariff_df):
             marker=dict(
                 size=10,
                 color=marker_colors,
-                symbol=today_rates.apply(
-                    lambda row: 'star' if row['valid_from'] in cheapest_slots['valid_from'].values else 'circle', 
-                    axis=1
-                )
+                symbol=marker_symbols
             ),
             hovertemplate='%{x|%H:%M}: %{y:.2f}p/kWh<extra></extra>'
         ))
@@ -241,20 +262,21 @@ def create_combined_usage_cost_chart(consumption_df, cost_df=None):
     
     # Add cost line if cost data is available
     if cost_df is not None and not cost_df.empty:
-        # Group by day for daily costs
-        daily_usage_cost = cost_df.groupby('date')['cost'].sum().reset_index()
-        daily_standing_charge = cost_df.groupby('date')['standing_charge'].sum().reset_index()
-        
-        # Merge the two dataframes
-        daily_costs = pd.merge(daily_usage_cost, daily_standing_charge, on='date')
+        # Group by day for daily costs, summing both cost columns in one pass
+        daily_costs = cost_df.groupby('date', sort=True).agg(
+            cost=('cost', 'sum'),
+            standing_charge=('standing_charge', 'sum')
+        ).reset_index()
         
         # Calculate total cost (usage + standing charge)
-        daily_costs['total_cost'] = daily_costs['cost'] + daily_costs['standing_charge']
+        daily_costs['total_cost'] = daily_costs['cost'].to_numpy() + daily_costs['standing_charge'].to_numpy()
+        
+        total_costs = daily_costs['total_cost'].to_numpy()
         
         # Add total cost line
         fig.add_trace(go.Scatter(
             x=daily_costs['date'],
-            y=daily_costs['total_cost'],
+            y=total_costs,
             mode='lines+markers',
             name='Total Cost (£)',
             line=dict(color='red', width=3),
@@ -263,17 +285,21 @@ def create_combined_usage_cost_chart(consumption_df, cost_df=None):
             yaxis='y2'  # Use secondary y-axis
         ))
         
-        # Add cost annotation for each point
-        for i, row in daily_costs.iterrows():
-            fig.add_annotation(
-                x=row['date'],
-                y=row['total_cost'],
-                text=f"£{row['total_cost']:.2f}",
-                yshift=10,
-                showarrow=False,
-                font=dict(size=10, color="red"),
-                yref='y2'
-            )
+        # Format all the cost labels in one vectorized pass
+        cost_labels = np.char.add('£', np.char.mod('%.2f', daily_costs['total_cost'].to_numpy()))
+        
+        # Label every point with its cost using a single text trace
+        fig.add_trace(go.Scatter(
+            x=daily_costs['date'],
+            y=total_costs,
+            mode='text',
+            text=cost_labels,
+            textposition='top center',
+            textfont=dict(size=10, color="red"),
+            hoverinfo='skip',
+            showlegend=False,
+            yaxis='y2'
+        ))
     
     # Configure the layout with dual y-axes
     fig.update_layout(
@@ -329,12 +355,11 @@ def create_cost_chart(cost_df):
     if cost_df.empty:
         return go.Figure()
     
-    # Group by day for daily costs
-    daily_usage_cost = cost_df.groupby('date')['cost'].sum().reset_index()
-    daily_standing_charge = cost_df.groupby('date')['standing_charge'].sum().reset_index()
-    
-    # Merge the two dataframes
-    daily_costs = pd.merge(daily_usage_cost, daily_standing_charge, on='date')
+    # Group by day for daily costs, summing both cost columns in one pass
+    daily_costs = cost_df.groupby('date', sort=True).agg(
+        cost=('cost', 'sum'),
+        standing_charge=('standing_charge', 'sum')
+    ).reset_index()
     
     # Create figure
     fig = go.Figure()